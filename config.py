@@ -2,17 +2,26 @@
 from functools import lru_cache
 from typing import List, Optional
 
-from pydantic import BaseSettings, EmailStr, Field, validator
+from pydantic import BaseSettings, EmailStr, Field, root_validator, validator
 
 
 class Settings(BaseSettings):
     """Runtime settings loaded from environment variables."""
 
     bot_token: str = Field(..., env="TOKEN")
+    telegram_api_server: Optional[str] = Field(None, env="TELEGRAM_API_SERVER")
+    telegram_connections_limit: int = Field(100, env="TELEGRAM_CONNECTIONS_LIMIT")
+    telegram_keepalive_timeout: float = Field(60.0, env="TELEGRAM_KEEPALIVE_TIMEOUT")
+    telegram_dns_cache_ttl: int = Field(300, env="TELEGRAM_DNS_CACHE_TTL")
+    telegram_max_retries: int = Field(3, env="TELEGRAM_MAX_RETRIES")
+    telegram_backoff_base: float = Field(0.5, env="TELEGRAM_BACKOFF_BASE")
+    telegram_backoff_max: float = Field(10.0, env="TELEGRAM_BACKOFF_MAX")
+    telegram_max_retry_after: float = Field(30.0, env="TELEGRAM_MAX_RETRY_AFTER")
 
     email_password: str = Field(..., env="EMAIL_PASSWORD")
     email_host: str = Field(..., env="HOST")
     email_from: EmailStr = Field(..., env="EMAIL_FROM")
+    email_use_ssl: bool = Field(True, env="EMAIL_USE_SSL")
 
     email_to: List[EmailStr] = Field(default_factory=list, env="EMAIL_TO")
     email_to_1: Optional[EmailStr] = Field(None, env="EMAIL_TO_1")
@@ -31,11 +40,34 @@ class Settings(BaseSettings):
         env="PAYMENT_DESCRIPTION_TEMPLATE",
     )
 
+    outbox_path: str = Field("data/outbox.sqlite3", env="OUTBOX_PATH")
+    outbox_batch_size: int = Field(20, env="OUTBOX_BATCH_SIZE")
+    outbox_poll_interval: float = Field(2.0, env="OUTBOX_POLL_INTERVAL")
+    outbox_backoff_base: float = Field(5.0, env="OUTBOX_BACKOFF_BASE")
+    outbox_backoff_max: float = Field(900.0, env="OUTBOX_BACKOFF_MAX")
+    outbox_max_attempts: int = Field(10, env="OUTBOX_MAX_ATTEMPTS")
+
+    subscriptions_path: str = Field("data/subscriptions.sqlite3", env="SUBSCRIPTIONS_PATH")
+    scheduler_batch_size: int = Field(100, env="SCHEDULER_BATCH_SIZE")
+    scheduler_rate_limit: float = Field(20.0, env="SCHEDULER_RATE_LIMIT")
+    scheduler_poll_interval: float = Field(30.0, env="SCHEDULER_POLL_INTERVAL")
+    scheduler_retry_delay: float = Field(300.0, env="SCHEDULER_RETRY_DELAY")
+
+    admin_ids: List[int] = Field(default_factory=list, env="ADMIN_IDS")
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
         case_sensitive = False
 
+        @classmethod
+        def parse_env_var(cls, field_name: str, raw_val: str):
+            """Accept comma separated values for list fields besides JSON arrays."""
+
+            if field_name in {"email_to", "admin_ids"} and not raw_val.lstrip().startswith("["):
+                return [item.strip() for item in raw_val.split(",") if item.strip()]
+            return cls.json_loads(raw_val)
+
     @property
     def email_recipients(self) -> List[str]:
         """Return a combined, de-duplicated list of e-mail recipients."""
@@ -54,6 +86,15 @@ class Settings(BaseSettings):
             return [item.strip() for item in value.split(",") if item.strip()]
         return value or []
 
+    @root_validator(skip_on_failure=True)
+    def _require_recipients(cls, values):  # noqa: D401 - short helper
+        """Refuse to start without anybody to notify about new requests."""
+
+        extras = ("email_to_1", "email_to_2", "email_to_3", "email_to_4")
+        if not values.get("email_to") and not any(values.get(name) for name in extras):
+            raise ValueError("Configure at least one notification recipient in EMAIL_TO or EMAIL_TO_1..EMAIL_TO_4")
+        return values
+
 
 @lru_cache()
 def get_settings() -> Settings:
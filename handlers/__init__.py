@@ -1,3 +1,8 @@
+from config import settings
+
+if settings.admin_ids:
+    # Registered first so admin commands win over the state handlers of the dialog.
+    from . import admin  # noqa: F401
 from .services import dp
 
 __all__ = ["dp"]
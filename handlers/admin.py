@@ -0,0 +1,128 @@
+"""Admin-only diagnostics: CPU profiling, allocation diffs and event-loop health.
+
+The module is imported only when ``ADMIN_IDS`` is configured, and profilers run only
+for the duration of a command, so there is no overhead while nobody is profiling.
+"""
+import asyncio
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from collections import Counter
+
+from aiogram import types
+from aiogram.dispatcher.filters import Command
+from aiogram.types import InputFile
+
+from config import settings
+from loader import bot, dp, outbox
+
+DEFAULT_CAPTURE_SECONDS = 10
+MAX_CAPTURE_SECONDS = 300
+TOP_ENTRIES = 40
+
+# cProfile and tracemalloc are process-wide, so only one capture may run at a time.
+_capture_lock = asyncio.Lock()
+
+
+def _capture_seconds(message: types.Message) -> int:
+    argument = (message.get_args() or "").strip()
+    if argument.isdigit():
+        return max(1, min(int(argument), MAX_CAPTURE_SECONDS))
+    return DEFAULT_CAPTURE_SECONDS
+
+
+def _as_document(text: str, filename: str) -> InputFile:
+    return InputFile(io.BytesIO(text.encode("utf-8")), filename=filename)
+
+
+async def _measure_loop_lag(samples: int = 20, interval: float = 0.05) -> list:
+    loop = asyncio.get_event_loop()
+    lags = []
+    for _ in range(samples):
+        scheduled = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - scheduled - interval))
+    return sorted(lags)
+
+
+@dp.message_handler(Command("profile"), user_id=settings.admin_ids, state="*")
+async def profile_command(message: types.Message):
+    if _capture_lock.locked():
+        await message.answer("Другой замер уже выполняется, попробуйте позже.")
+        return
+    seconds = _capture_seconds(message)
+    async with _capture_lock:
+        await message.answer(f"Профилирование CPU на {seconds} с…")
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+    report = io.StringIO()
+    stats = pstats.Stats(profiler, stream=report)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_ENTRIES)
+    report.write("\n")
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(TOP_ENTRIES)
+    await message.answer_document(
+        _as_document(report.getvalue(), "profile.txt"), caption=f"cProfile за {seconds} с"
+    )
+
+
+@dp.message_handler(Command("memory"), user_id=settings.admin_ids, state="*")
+async def memory_command(message: types.Message):
+    if _capture_lock.locked():
+        await message.answer("Другой замер уже выполняется, попробуйте позже.")
+        return
+    seconds = _capture_seconds(message)
+    async with _capture_lock:
+        await message.answer(f"Сравнение снимков tracemalloc с интервалом {seconds} с…")
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start(10)
+        try:
+            before = tracemalloc.take_snapshot()
+            await asyncio.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started_here:
+                tracemalloc.stop()
+    filters = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    differences = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    lines = [
+        f"Traced memory: current={current / 2**20:.1f}MiB peak={peak / 2**20:.1f}MiB",
+        "Note: allocations made before the first snapshot are only visible if tracing was already active.",
+        "",
+        f"Top {TOP_ENTRIES} differences by line:",
+    ]
+    lines.extend(str(difference) for difference in differences[:TOP_ENTRIES])
+    await message.answer_document(
+        _as_document("\n".join(lines), "tracemalloc.txt"), caption=f"tracemalloc за {seconds} с"
+    )
+
+
+@dp.message_handler(Command("loop"), user_id=settings.admin_ids, state="*")
+async def loop_command(message: types.Message):
+    lags = await _measure_loop_lag()
+    tasks = asyncio.all_tasks()
+    coroutines = Counter(getattr(task.get_coro(), "__qualname__", repr(task.get_coro())) for task in tasks)
+    outbox_stats = outbox.stats()
+    lines = [
+        f"Collected at: {time.strftime('%Y-%m-%d %H:%M:%S')}",
+        f"Event loop lag: p50={lags[len(lags) // 2] * 1000:.1f}ms max={lags[-1] * 1000:.1f}ms",
+        f"Pending tasks: {len(tasks)}",
+    ]
+    lines.extend(f"  {count:>5}  {name}" for name, count in coroutines.most_common(TOP_ENTRIES))
+    lines.extend(
+        [
+            "",
+            f"Outbox: pending={outbox_stats.pending} retrying={outbox_stats.retrying} "
+            f"dead_letter={outbox_stats.dead_letter} oldest_age={outbox_stats.oldest_pending_age:.1f}s",
+            "",
+            bot.format_stats(),
+        ]
+    )
+    await message.answer_document(_as_document("\n".join(lines), "loop.txt"), caption="Состояние event loop")
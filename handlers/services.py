@@ -1,14 +1,19 @@
 """Conversation handlers for the service request bot."""
+import asyncio
+import hashlib
+import json
 import logging
 import re
+import time
 from email.message import EmailMessage
-from typing import Optional
+from typing import List, Optional, Tuple
 from urllib.parse import quote
 
 from aiogram import types
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters import Command, Text
 from aiogram.types import CallbackQuery, InputFile, ReplyKeyboardRemove
+from aiogram.utils.exceptions import InvalidQueryID
 from asgiref.sync import sync_to_async
 
 from config import settings
@@ -19,17 +24,29 @@ from keyboards.choise_buttons import (
     build_payment_keyboard,
     build_plan_keyboard,
     build_skip_keyboard,
+    build_unsubscribe_keyboard,
     get_service_keyboard,
     get_social_network_keyboard,
 )
-from loader import bot, dp
-from service_catalog import SERVICE_OPTIONS, ServiceOption, SubscriptionPlan, resolve_service_option, resolve_social_network
+from loader import bot, dp, outbox, subscriptions
+from scheduler import Subscription, SubscriptionCancelled
+from service_catalog import (
+    FIRST_REPORT_DELAY_DAYS,
+    SERVICE_OPTIONS,
+    SUBSCRIPTION_PERIOD_DAYS,
+    SUBSCRIPTION_PLANS,
+    ServiceOption,
+    SubscriptionPlan,
+    resolve_service_option,
+    resolve_social_network,
+)
 
 logger = logging.getLogger(__name__)
 
 PHONE_SANITIZE_PATTERN = re.compile(r"[\s()-]")
 EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
 SKIP_WORDS = {"пропустить", "skip", "no", "нет"}
+DAY_SECONDS = 24 * 60 * 60
 
 
 def format_price(price: int) -> str:
@@ -62,12 +79,9 @@ def make_hash(price: int, phone: str, telegram_id: int) -> str:
         f"{settings.robokassa_merchant_login}:{price}:0:{settings.robokassa_password1}:"
         f"Shp_phone={phone}:Shp_telegram={telegram_id}"
     )
-    import hashlib
-
     return hashlib.md5(payload.encode("utf-8")).hexdigest()
 
 
-@sync_to_async
 def make_link(data: dict) -> str:
     phone = data["phone"]
     telegram_id = data["telegram_id"]
@@ -87,13 +101,11 @@ def make_link(data: dict) -> str:
     )
 
 
-@sync_to_async
-def post_data_to_email(data: dict) -> bool:
-    recipients = settings.email_recipients
-    if not recipients:
-        logger.warning("No email recipients configured; skipping notification.")
-        return False
+def format_timestamp(timestamp: float) -> str:
+    return time.strftime("%d.%m.%Y %H:%M", time.localtime(timestamp))
+
 
+def _request_email(data: dict) -> Tuple[str, str]:
     message_lines = [
         "Получена новая заявка из Telegram-бота IST-detector.",
         "",
@@ -114,26 +126,121 @@ def post_data_to_email(data: dict) -> bool:
         message_lines.append(data["comment"])
     if data.get("payment_link"):
         message_lines.extend(["", f"Ссылка для оплаты: {data['payment_link']}"])
-    body = "\n".join(message_lines)
+    return "Новая заявка из Telegram-бота IST-detector", "\n".join(message_lines)
+
+
+def _monitoring_report_email(data: dict) -> Tuple[str, str]:
+    message_lines = [
+        "Наступил срок планового отчета мониторинга. Подготовьте отчет и направьте его клиенту в Telegram.",
+        "",
+        f"Подписка №{data.get('subscription_id')}, отчет №{data.get('report_number')}",
+        f"Telegram ID: {data.get('telegram_id')}",
+        f"Объект: {data.get('target')}",
+        f"Тариф: {data.get('plan_label')}",
+        f"Срок отчета: {data.get('due_at')}",
+        f"Подписка действует до: {data.get('expires_at')}",
+    ]
+    return f"Отчет мониторинга: {data.get('target')}", "\n".join(message_lines)
+
+
+def _monitoring_cancelled_email(data: dict) -> Tuple[str, str]:
+    message_lines = [
+        "Клиент отключил подписку на мониторинг, отчеты по ней больше не нужны.",
+        "",
+        f"Подписка №{data.get('subscription_id')}",
+        f"Пользователь: {data.get('username', '—')}",
+        f"Telegram ID: {data.get('telegram_id')}",
+        f"Объект: {data.get('target')}",
+        f"Тариф: {data.get('plan_label')}",
+    ]
+    return f"Подписка отключена: {data.get('target')}", "\n".join(message_lines)
 
+
+# Outbox payloads without a "kind" are new requests queued before kinds existed.
+EMAIL_FORMATTERS = {
+    "request": _request_email,
+    "monitoring_report": _monitoring_report_email,
+    "monitoring_cancelled": _monitoring_cancelled_email,
+}
+
+
+def build_email(data: dict) -> EmailMessage:
+    subject, body = EMAIL_FORMATTERS[data.get("kind", "request")](data)
     email_message = EmailMessage()
-    email_message["Subject"] = "Новая заявка из Telegram-бота IST-detector"
+    email_message["Subject"] = subject
     email_message["From"] = settings.email_from
     email_message.set_content(body)
+    return email_message
+
+
+@sync_to_async
+def post_data_to_email(payloads: List[dict]) -> List[bool]:
+    """Send a batch of notifications over one SMTP session and report which ones went out."""
 
     import smtplib
 
+    recipients = settings.email_recipients
+    results = [False] * len(payloads)
     try:
-        with smtplib.SMTP_SSL(settings.email_host) as server:
+        smtp_class = smtplib.SMTP_SSL if settings.email_use_ssl else smtplib.SMTP
+        with smtp_class(settings.email_host) as server:
             server.login(settings.email_from, settings.email_password)
-            for recipient in recipients:
-                email_message["To"] = recipient
-                server.send_message(email_message)
-                del email_message["To"]
+            for index, data in enumerate(payloads):
+                email_message = build_email(data)
+                try:
+                    for recipient in recipients:
+                        email_message["To"] = recipient
+                        server.send_message(email_message)
+                        del email_message["To"]
+                except smtplib.SMTPServerDisconnected:
+                    raise
+                except smtplib.SMTPException as exc:  # pragma: no cover - depends on the SMTP server
+                    logger.warning("Failed to send notification email: %s", exc)
+                    continue
+                results[index] = True
     except Exception as exc:  # pragma: no cover - network errors are environment specific
-        logger.exception("Failed to send notification email: %s", exc)
-        return False
-    return True
+        logger.exception("Failed to send notification emails: %s", exc)
+    return results
+
+
+def schedule_subscription(data: dict) -> None:
+    service = get_service_by_code(data["service_code"])
+    plan = get_plan_by_code(service, data["subscription_plan_code"])
+    if not plan:
+        return
+    now = time.time()
+    try:
+        subscriptions.add(
+            telegram_id=data["telegram_id"],
+            plan_code=plan.code,
+            plan_label=plan.label,
+            target=f"{data.get('social_net')}: {data.get('link')}",
+            interval_seconds=plan.interval_days * DAY_SECONDS,
+            first_run_at=now + FIRST_REPORT_DELAY_DAYS * DAY_SECONDS,
+            period_seconds=SUBSCRIPTION_PERIOD_DAYS * DAY_SECONDS,
+            now=now,
+        )
+    except Exception as exc:  # pragma: no cover - storage errors are environment specific
+        logger.exception("Failed to schedule monitoring reports: %s", exc)
+
+
+async def queue_monitoring_report(subscription: Subscription) -> None:
+    """Ask the operators for the due report; the customer hears from them, not from a placeholder."""
+
+    if not any(plan.code == subscription.plan_code for plan in SUBSCRIPTION_PLANS):
+        raise SubscriptionCancelled(f"plan {subscription.plan_code} is no longer offered")
+    outbox.enqueue(
+        {
+            "kind": "monitoring_report",
+            "subscription_id": subscription.id,
+            "report_number": subscription.deliveries + 1,
+            "telegram_id": subscription.telegram_id,
+            "target": subscription.target,
+            "plan_label": subscription.plan_label,
+            "due_at": format_timestamp(subscription.next_run_at),
+            "expires_at": format_timestamp(subscription.expires_at),
+        }
+    )
 
 
 @dp.message_handler(Command("start"))
@@ -159,7 +266,8 @@ async def answer(message: types.Message, state: FSMContext):
 async def help_command(message: types.Message):
     await message.answer(
         "Я помогу оформить заявку на проверку безопасности аккаунтов. "
-        "Используйте /start, чтобы начать заново, /services, чтобы увидеть список услуг, и /cancel, чтобы прервать диалог."
+        "Используйте /start, чтобы начать заново, /services, чтобы увидеть список услуг, /cancel, чтобы прервать диалог, "
+        "и /unsubscribe, чтобы отключить мониторинг."
     )
 
 
@@ -178,6 +286,45 @@ async def cancel_command(message: types.Message, state: FSMContext):
     await message.answer("Диалог прерван. Чтобы начать заново, используйте /start.", reply_markup=ReplyKeyboardRemove())
 
 
+@dp.message_handler(Command("unsubscribe"), state="*")
+async def unsubscribe_command(message: types.Message):
+    active = subscriptions.active_for(message.from_user.id)
+    if not active:
+        await message.answer("У Вас нет активных подписок на мониторинг.")
+        return
+    await message.answer(
+        "Выберите подписку, которую нужно отключить:",
+        reply_markup=build_unsubscribe_keyboard(active),
+    )
+
+
+@dp.callback_query_handler(Text(startswith="unsubscribe:"), state="*")
+async def unsubscribe(call: CallbackQuery):
+    subscription_id = call.data.split(":", 1)[1]
+    subscription = next(
+        (item for item in subscriptions.active_for(call.from_user.id) if str(item.id) == subscription_id), None
+    )
+    if subscription is None or not subscriptions.deactivate(subscription.id, call.from_user.id):
+        await call.answer("Подписка уже отключена")
+        return
+    try:
+        outbox.enqueue(
+            {
+                "kind": "monitoring_cancelled",
+                "subscription_id": subscription.id,
+                "telegram_id": subscription.telegram_id,
+                "username": call.from_user.full_name,
+                "target": subscription.target,
+                "plan_label": subscription.plan_label,
+            }
+        )
+    except Exception as exc:  # pragma: no cover - storage errors are environment specific
+        logger.exception("Failed to queue unsubscribe notification: %s", exc)
+    await call.answer("Подписка отключена")
+    await call.message.edit_reply_markup()
+    await call.message.answer("Мониторинг отключен. Отчеты по этой подписке больше не будут готовиться.")
+
+
 @dp.message_handler(state=AuthState.social_net)
 async def get_social(message: types.Message, state: FSMContext):
     social_net = resolve_social_network(message.text)
@@ -234,10 +381,10 @@ async def prepare_for_phone(
 ) -> None:
     await state.update_data(price=price)
     if plan:
-        await state.update_data(subscription_plan=plan.label)
+        await state.update_data(subscription_plan=plan.label, subscription_plan_code=plan.code)
         await message.answer(f"Выбран тариф: {plan.label}\n{plan.description}")
     else:
-        await state.update_data(subscription_plan=None)
+        await state.update_data(subscription_plan=None, subscription_plan_code=None)
     await message.answer(f"Стоимость услуги: {format_price(price)} руб.")
     await message.answer(service.payment_hint)
     await message.answer(service.phone_prompt, reply_markup=ReplyKeyboardRemove())
@@ -328,32 +475,51 @@ async def send_confirmation(message: types.Message, state: FSMContext) -> None:
     )
 
 
+async def answer_callback(call: CallbackQuery) -> None:
+    try:
+        await call.answer()
+    except InvalidQueryID:
+        # The query expired while the bot was busy; the client has already dropped the spinner.
+        logger.info("Callback query %s expired before it was answered", call.id)
+
+
 @dp.callback_query_handler(Text(equals="confirm_request"), state=AuthState.confirmation)
 async def confirm_request(call: CallbackQuery, state: FSMContext):
-    await call.answer()
     data = await state.get_data()
-    telegram_id = call.from_user.id
-    data.setdefault("telegram_id", telegram_id)
+    data.setdefault("telegram_id", call.from_user.id)
     data.setdefault("username", call.from_user.full_name)
-    payment_link = await make_link(data)
-    await state.update_data(payment_link=payment_link)
-    await call.message.edit_reply_markup()
-    await call.message.answer(
-        "Вы можете оплатить заказ через Робокассу по ссылке ниже:",
-        reply_markup=build_payment_keyboard(payment_link),
+    payment_link = make_link(data)
+    data["payment_link"] = payment_link
+    try:
+        outbox.enqueue(data)
+    except Exception:  # pragma: no cover - storage errors are environment specific
+        # The state is kept so the user can confirm again, and the payload is logged so
+        # the order can be recovered by hand if the outbox stays unavailable.
+        logger.exception("Failed to queue request: %s", json.dumps(data, ensure_ascii=False, default=str))
+        await answer_callback(call)
+        await call.message.answer(
+            "Не удалось сохранить заявку. Пожалуйста, нажмите «Подтвердить» ещё раз через минуту."
+        )
+        return
+    if data.get("subscription_plan_code"):
+        schedule_subscription(data)
+    await state.finish()
+    # Only the three chat messages have to keep their order. The callback answer and
+    # the keyboard removal overlap with the first one, and the answer comes after the
+    # outbox write so a stale query cannot lose the order.
+    await asyncio.gather(
+        answer_callback(call),
+        call.message.edit_reply_markup(),
+        call.message.answer(
+            "Вы можете оплатить заказ через Робокассу по ссылке ниже:",
+            reply_markup=build_payment_keyboard(payment_link),
+        ),
     )
     await call.message.answer(
         "Отчет о работе будет направлен в этот Telegram. Также доступен договор и реквизиты:",
         reply_markup=build_contract_keyboard(),
     )
-    email_sent = await post_data_to_email(await state.get_data())
-    if email_sent:
-        await call.message.answer("Заявка отправлена. Мы свяжемся с Вами в ближайшее время!")
-    else:
-        await call.message.answer(
-            "Не удалось автоматически отправить уведомление по e-mail. Мы проверим заявку вручную."
-        )
-    await state.finish()
+    await call.message.answer("Заявка принята. Мы свяжемся с Вами в ближайшее время!")
 
 
 @dp.callback_query_handler(Text(equals="cancel_request"), state=AuthState.confirmation)
@@ -8,6 +8,7 @@ from aiogram.types import (
     ReplyKeyboardMarkup,
 )
 
+from scheduler import Subscription
 from service_catalog import SERVICE_OPTIONS, SOCIAL_NETWORKS, SubscriptionPlan
 
 
@@ -67,3 +68,15 @@ def build_skip_keyboard() -> ReplyKeyboardMarkup:
     markup = ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
     markup.add(KeyboardButton("Пропустить"))
     return markup
+
+
+def build_unsubscribe_keyboard(subscriptions: Iterable[Subscription]) -> InlineKeyboardMarkup:
+    markup = InlineKeyboardMarkup(row_width=1)
+    for subscription in subscriptions:
+        markup.insert(
+            InlineKeyboardButton(
+                text=f"Отключить: {subscription.target} ({subscription.plan_label})",
+                callback_data=f"unsubscribe:{subscription.id}",
+            )
+        )
+    return markup
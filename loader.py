@@ -1,16 +1,36 @@
 """Telegram bot initialization helpers."""
 import logging
 
-from aiogram import Bot, Dispatcher
+from aiogram import Dispatcher
+from aiogram.bot.api import TELEGRAM_PRODUCTION, TelegramAPIServer
 from aiogram.contrib.fsm_storage.memory import MemoryStorage
 
 from config import settings
+from outbox import NotificationOutbox
+from scheduler import SubscriptionStore
+from transport import TelegramBot
 
 logging.basicConfig(
     format=u"%(filename)s [LINE:%(lineno)d] #%(levelname)-8s [%(asctime)s]  %(message)s",
     level=logging.INFO,
 )
 
-bot = Bot(settings.bot_token, parse_mode="HTML")
+api_server = (
+    TelegramAPIServer.from_base(settings.telegram_api_server) if settings.telegram_api_server else TELEGRAM_PRODUCTION
+)
+bot = TelegramBot(
+    settings.bot_token,
+    parse_mode="HTML",
+    server=api_server,
+    connections_limit=settings.telegram_connections_limit,
+    keepalive_timeout=settings.telegram_keepalive_timeout,
+    dns_cache_ttl=settings.telegram_dns_cache_ttl,
+    max_retries=settings.telegram_max_retries,
+    backoff_base=settings.telegram_backoff_base,
+    backoff_max=settings.telegram_backoff_max,
+    max_retry_after=settings.telegram_max_retry_after,
+)
 storage = MemoryStorage()
 dp = Dispatcher(bot, storage=storage)
+outbox = NotificationOutbox(settings.outbox_path)
+subscriptions = SubscriptionStore(settings.subscriptions_path)
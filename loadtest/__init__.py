@@ -0,0 +1 @@
+"""Load-testing harness with local Telegram Bot API and SMTP stand-ins."""
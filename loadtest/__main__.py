@@ -0,0 +1,152 @@
+"""Run the bot process against local Bot API and SMTP stand-ins and report how it copes.
+
+Usage::
+
+    python -m loadtest --users 2000 --arrival-rate 100 --think-time 0.5 --drop-rate 0.05
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from loadtest.fake_bot_api import FakeBotAPI
+from loadtest.fake_smtp import FakeSMTPServer
+from loadtest.runner import ADMIN_USER_ID, LoadProfile, LoadRunner, percentile
+from outbox import NotificationOutbox
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+BOT_START_TIMEOUT = 30.0
+BOT_STOP_TIMEOUT = 30.0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000, help="number of simulated users")
+    parser.add_argument("--arrival-rate", type=float, default=50.0, help="new users per second (0 = all at once)")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean pause between steps, seconds")
+    parser.add_argument("--drop-rate", type=float, default=0.05, help="probability of abandoning at each step")
+    parser.add_argument("--step-timeout", type=float, default=30.0, help="seconds to wait for the bot's replies")
+    parser.add_argument("--drain-timeout", type=float, default=30.0, help="seconds to wait for the outbox to empty")
+    parser.add_argument("--p95-target", type=float, default=None, help="fail if any step p95 exceeds this, ms")
+    parser.add_argument("--api-error-rate", type=float, default=0.0, help="share of Bot API calls failing with 429/502")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+async def start_bot(api: FakeBotAPI, env: dict, log_path: str) -> asyncio.subprocess.Process:
+    """Launch ``main.py`` in its own process and wait until it polls for updates."""
+
+    with open(log_path, "wb") as log:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "main.py", cwd=str(PROJECT_ROOT), env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+    polling = asyncio.ensure_future(api.polling.wait())
+    exited = asyncio.ensure_future(process.wait())
+    await asyncio.wait({polling, exited}, timeout=BOT_START_TIMEOUT, return_when=asyncio.FIRST_COMPLETED)
+    polling.cancel()
+    if not api.polling.is_set():
+        exited.cancel()
+        await stop_bot(process)
+        raise RuntimeError(f"the bot did not start polling, see {log_path}")
+    exited.cancel()
+    return process
+
+
+async def stop_bot(process: asyncio.subprocess.Process) -> None:
+    """Interrupt the bot so it runs its shutdown hooks, killing it if it hangs."""
+
+    if process.returncode is not None:
+        return
+    process.send_signal(signal.SIGINT)
+    try:
+        await asyncio.wait_for(process.wait(), BOT_STOP_TIMEOUT)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+
+
+async def run(args: argparse.Namespace) -> int:
+    api = FakeBotAPI(error_rate=args.api_error_rate)
+    smtp = FakeSMTPServer()
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    outbox_path = os.path.join(workdir, "outbox.sqlite3")
+    log_path = os.path.join(workdir, "bot.log")
+    env = dict(
+        os.environ,
+        TOKEN="123456:LOADTEST",
+        TELEGRAM_API_SERVER=await api.start(),
+        HOST=await smtp.start(),
+        EMAIL_USE_SSL="false",
+        EMAIL_PASSWORD="loadtest",
+        EMAIL_FROM="bot@example.com",
+        EMAIL_TO_1="operators@example.com",
+        OUTBOX_PATH=outbox_path,
+        OUTBOX_POLL_INTERVAL="0.2",
+        SUBSCRIPTIONS_PATH=os.path.join(workdir, "subscriptions.sqlite3"),
+        ADMIN_IDS=str(ADMIN_USER_ID),
+    )
+    logging.getLogger().setLevel(args.log_level.upper())
+
+    # The bot runs as it does in production, in its own process, so the loop lag, CPU
+    # time and memory reported below are its own and not shared with the harness.
+    bot = await start_bot(api, env, log_path)
+    try:
+        profile = LoadProfile(
+            users=args.users,
+            arrival_rate=args.arrival_rate,
+            think_time=args.think_time,
+            drop_rate=args.drop_rate,
+            step_timeout=args.step_timeout,
+            seed=args.seed,
+        )
+        runner = LoadRunner(api, profile, bot.pid)
+        report = await runner.run()
+
+        outbox = NotificationOutbox(outbox_path)
+        deadline = time.monotonic() + args.drain_timeout
+        while outbox.stats().pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+        report.outbox_pending = outbox.stats().pending
+        outbox.close()
+        report.bot_diagnostics = await runner.probe_loop() or ""
+    finally:
+        await stop_bot(bot)
+    report.emails_received = smtp.messages_received
+    report.smtp_sessions = smtp.sessions
+    report.late_replies = api.discarded_messages
+    await smtp.stop()
+    await api.stop()
+
+    print(report.format())
+    print()
+    print(report.bot_diagnostics.split("\n\n")[-1] if report.bot_diagnostics else "Bot diagnostics unavailable")
+    print(f"\nBot log: {log_path}")
+    if args.p95_target is not None:
+        slow = {
+            name: percentile(sorted(values), 95) * 1000
+            for name, values in report.step_latencies.items()
+            if percentile(sorted(values), 95) * 1000 > args.p95_target
+        }
+        if slow:
+            print(f"p95 target of {args.p95_target:.0f}ms exceeded: {slow}", file=sys.stderr)
+            return 1
+    return 1 if report.failed else 0
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    os.chdir(PROJECT_ROOT)
+    if str(PROJECT_ROOT) not in sys.path:
+        sys.path.insert(0, str(PROJECT_ROOT))
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""Local stand-in for the Telegram Bot API used by the load generator."""
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Optional
+
+from aiohttp import web
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "LoadTest", "username": "loadtest_bot"}
+
+
+class FakeBotAPI:
+    """Local HTTP server speaking the subset of the Bot API the bot relies on.
+
+    Updates pushed by simulated users are served through ``getUpdates``; every message
+    the bot sends is routed to the queue registered for its chat in ``inboxes`` so users
+    can wait for the reply; documents carry their decoded text. ``polling`` is set once
+    the bot starts fetching updates. Messages for unregistered chats, e.g. late replies to users
+    who already gave up, are counted and discarded.
+    A share of ``error_rate`` calls other than ``getUpdates`` is answered with 429
+    or 502 to exercise the bot's retry policy, and every such call can be slowed down
+    by ``latency`` seconds to mimic the round trip to Telegram.
+    """
+
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 0, error_rate: float = 0.0, latency: float = 0.0
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.error_rate = error_rate
+        self.latency = latency
+        self.injected_errors: Counter = Counter()
+        self.webhook_url = ""
+        self.method_calls: Counter = Counter()
+        self.inboxes: Dict[int, asyncio.Queue] = {}
+        self.discarded_messages = 0
+        self.polling = asyncio.Event()
+        self._updates: Deque[dict] = deque()
+        self._new_updates = asyncio.Event()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._callback_ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+        self._methods = {
+            "getme": self._get_me,
+            "getupdates": self._get_updates,
+            "setwebhook": self._set_webhook,
+            "deletewebhook": self._delete_webhook,
+            "getwebhookinfo": self._get_webhook_info,
+            "sendmessage": self._send_message,
+            "sendphoto": self._send_photo,
+            "senddocument": self._send_document,
+            "editmessagereplymarkup": self._edit_message_reply_markup,
+            "answercallbackquery": self._answer_callback_query,
+            "close": self._ok,
+            "logout": self._ok,
+        }
+
+    async def start(self) -> str:
+        """Start serving and return the base URL to pass as ``TELEGRAM_API_SERVER``."""
+
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self._dispatch)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        return f"http://{self.host}:{self.port}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def push_message(self, user: dict, text: str) -> None:
+        self._push_update(
+            message={
+                "message_id": next(self._message_ids),
+                "from": user,
+                "chat": {"id": user["id"], "type": "private"},
+                "date": int(time.time()),
+                "text": text,
+            }
+        )
+
+    def push_callback(self, user: dict, message: dict, data: str) -> None:
+        self._push_update(
+            callback_query={
+                "id": str(next(self._callback_ids)),
+                "from": user,
+                "message": message,
+                "chat_instance": str(user["id"]),
+                "data": data,
+            }
+        )
+
+    def _push_update(self, **payload: Any) -> None:
+        self._updates.append({"update_id": next(self._update_ids), **payload})
+        self._new_updates.set()
+
+    async def _dispatch(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        handler = self._methods.get(method.lower())
+        self.method_calls[method] += 1
+        if handler is None:
+            return web.json_response(
+                {"ok": False, "error_code": 404, "description": "Not Found: method not found"}, status=404
+            )
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        if self.latency and method.lower() != "getupdates":
+            await asyncio.sleep(self.latency)
+        if self.error_rate and method.lower() != "getupdates" and random.random() < self.error_rate:
+            return self._inject_error(method)
+        return web.json_response({"ok": True, "result": await handler(params)})
+
+    def _inject_error(self, method: str) -> web.Response:
+        self.injected_errors[method] += 1
+        if random.random() < 0.5:
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": "Too Many Requests: retry after 1",
+                    "parameters": {"retry_after": 1},
+                },
+                status=429,
+            )
+        return web.json_response({"ok": False, "error_code": 502, "description": "Bad Gateway"}, status=502)
+
+    def _deliver(self, chat_id: int, **content: Any) -> dict:
+        message = {
+            "message_id": next(self._message_ids),
+            "from": BOT_USER,
+            "chat": {"id": chat_id, "type": "private"},
+            "date": int(time.time()),
+            **content,
+        }
+        inbox = self.inboxes.get(chat_id)
+        if inbox is None:
+            self.discarded_messages += 1
+        else:
+            inbox.put_nowait(message)
+        return message
+
+    async def _ok(self, params: dict) -> bool:
+        return True
+
+    async def _get_me(self, params: dict) -> dict:
+        return BOT_USER
+
+    async def _get_updates(self, params: dict) -> list:
+        self.polling.set()
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        if offset < 0:
+            while len(self._updates) > -offset:
+                self._updates.popleft()
+        else:
+            while self._updates and self._updates[0]["update_id"] < offset:
+                self._updates.popleft()
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(itertools.islice(self._updates, limit))
+
+    async def _set_webhook(self, params: dict) -> bool:
+        self.webhook_url = params.get("url", "")
+        return True
+
+    async def _delete_webhook(self, params: dict) -> bool:
+        self.webhook_url = ""
+        return True
+
+    async def _get_webhook_info(self, params: dict) -> dict:
+        return {"url": self.webhook_url, "has_custom_certificate": False, "pending_update_count": len(self._updates)}
+
+    async def _send_message(self, params: dict) -> dict:
+        content = {"text": params.get("text", "")}
+        markup = json.loads(params["reply_markup"]) if params.get("reply_markup") else None
+        if markup and "inline_keyboard" in markup:
+            content["reply_markup"] = markup
+        return self._deliver(int(params["chat_id"]), **content)
+
+    async def _send_photo(self, params: dict) -> dict:
+        photo = {"file_id": "loadtest-photo", "file_unique_id": "loadtest-photo", "width": 1, "height": 1}
+        return self._deliver(int(params["chat_id"]), photo=[photo], caption=params.get("caption", ""))
+
+    async def _send_document(self, params: dict) -> dict:
+        document = {"file_id": "loadtest-document", "file_unique_id": "loadtest-document"}
+        upload = params.get("document")
+        if isinstance(upload, web.FileField):
+            document["text"] = upload.file.read().decode("utf-8", errors="replace")
+        return self._deliver(int(params["chat_id"]), document=document, caption=params.get("caption", ""))
+
+    async def _edit_message_reply_markup(self, params: dict) -> bool:
+        return True
+
+    async def _answer_callback_query(self, params: dict) -> bool:
+        return True
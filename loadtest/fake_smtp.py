@@ -0,0 +1,67 @@
+"""Minimal SMTP sink accepting the notifications sent by the bot."""
+import asyncio
+from typing import Optional
+
+
+class FakeSMTPServer:
+    """Plain-text SMTP server that acknowledges and counts every session and message.
+
+    Only the commands issued by :mod:`smtplib` for ``login`` and ``send_message`` are
+    understood; the bot has to run with ``EMAIL_USE_SSL=false`` to talk to it.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.host = host
+        self.port = port
+        self.messages_received = 0
+        self.sessions = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> str:
+        """Start listening and return the ``host:port`` value for ``HOST``."""
+
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return f"{self.host}:{self.port}"
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.sessions += 1
+        writer.write(b"220 loadtest ESMTP\r\n")
+        try:
+            while True:
+                await writer.drain()
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode("ascii", errors="replace").strip().upper()
+                if command.startswith("EHLO"):
+                    writer.write(b"250-loadtest\r\n250-AUTH PLAIN\r\n250 8BITMIME\r\n")
+                elif command.startswith("HELO"):
+                    writer.write(b"250 loadtest\r\n")
+                elif command.startswith("AUTH"):
+                    writer.write(b"235 Authentication successful\r\n")
+                elif command.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                    writer.write(b"250 OK\r\n")
+                elif command.startswith("DATA"):
+                    writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                    await writer.drain()
+                    while (await reader.readline()) not in (b".\r\n", b""):
+                        pass
+                    self.messages_received += 1
+                    writer.write(b"250 OK\r\n")
+                elif command.startswith("QUIT"):
+                    writer.write(b"221 Bye\r\n")
+                    await writer.drain()
+                    break
+                else:
+                    writer.write(b"502 Command not implemented\r\n")
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,274 @@
+"""Simulated users walking through the ``AuthState`` conversation."""
+import asyncio
+import math
+import os
+import random
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from loadtest.fake_bot_api import FakeBotAPI
+from service_catalog import SERVICE_OPTIONS, SOCIAL_NETWORKS
+
+USER_ID_OFFSET = 10_000_000
+# The harness talks to the bot's /loop diagnostics command as this admin user.
+ADMIN_USER_ID = USER_ID_OFFSET - 1
+LOOP_LAG_PATTERN = re.compile(r"Event loop lag: p50=([\d.]+)ms max=([\d.]+)ms")
+
+
+@dataclass
+class LoadProfile:
+    users: int = 1000
+    arrival_rate: float = 50.0
+    think_time: float = 1.0
+    drop_rate: float = 0.05
+    step_timeout: float = 30.0
+    probe_interval: float = 2.0
+    seed: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class Step:
+    name: str
+    text: Optional[str] = None
+    callback_data: Optional[str] = None
+    replies: int = 1
+
+
+@dataclass
+class LoadReport:
+    duration: float = 0.0
+    started: int = 0
+    completed: int = 0
+    dropped: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    failed: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    step_latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    harness_loop_lag: List[float] = field(default_factory=list)
+    bot_loop_lag: List[Tuple[float, float]] = field(default_factory=list)
+    bot_diagnostics: str = ""
+    rss_start: int = 0
+    rss_peak: int = 0
+    rss_end: int = 0
+    cpu_seconds: float = 0.0
+    emails_received: int = 0
+    smtp_sessions: int = 0
+    outbox_pending: int = 0
+    late_replies: int = 0
+
+    @property
+    def updates_sent(self) -> int:
+        return sum(len(values) for values in self.step_latencies.values())
+
+    def format(self) -> str:
+        duration = max(self.duration, 1e-9)
+        lines = [
+            f"Duration: {self.duration:.1f}s",
+            f"Users: started={self.started} completed={self.completed} "
+            f"dropped={sum(self.dropped.values())} failed={sum(self.failed.values())}",
+            f"Throughput: {self.completed / duration:.2f} flows/s, {self.updates_sent / duration:.1f} updates/s",
+            "",
+            f"{'step':<12}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'drop':>7}{'fail':>7}",
+        ]
+        for name in _step_order(self):
+            values = sorted(self.step_latencies.get(name, []))
+            lines.append(
+                f"{name:<12}{len(values):>8}"
+                + "".join(f"{percentile(values, p) * 1000:>10.1f}" for p in (50, 95, 99, 100))
+                + f"{self.dropped.get(name, 0):>7}{self.failed.get(name, 0):>7}"
+            )
+        harness_lag = sorted(self.harness_loop_lag)
+        bot_lag_p50 = sorted(p50 for p50, _ in self.bot_loop_lag)
+        lines.extend(
+            [
+                "",
+                f"Bot event loop lag ({len(self.bot_loop_lag)} /loop probes): "
+                f"median p50={percentile(bot_lag_p50, 50):.1f}ms, "
+                f"max={max((worst for _, worst in self.bot_loop_lag), default=0.0):.1f}ms",
+                f"Bot CPU: {self.cpu_seconds:.1f}s ({self.cpu_seconds / duration * 100:.0f}% of one core)",
+                f"Bot RSS: start={self.rss_start / 2**20:.1f}MiB peak={self.rss_peak / 2**20:.1f}MiB "
+                f"end={self.rss_end / 2**20:.1f}MiB growth={(self.rss_end - self.rss_start) / 2**20:+.1f}MiB",
+                "Harness event loop lag: "
+                + ", ".join(f"p{p}={percentile(harness_lag, p) * 1000:.1f}ms" for p in (50, 99))
+                + f", max={percentile(harness_lag, 100) * 1000:.1f}ms",
+                f"Notifications: received by SMTP sink={self.emails_received} in {self.smtp_sessions} sessions, "
+                f"still pending={self.outbox_pending}",
+                f"Late replies to users who already left: {self.late_replies}",
+            ]
+        )
+        return "\n".join(lines)
+
+
+STEP_NAMES = ("start", "social_net", "service", "link", "plan", "phone", "email", "comment", "confirm")
+
+
+def _step_order(report: LoadReport) -> List[str]:
+    seen = set(report.step_latencies) | set(report.dropped) | set(report.failed)
+    return [name for name in STEP_NAMES if name in seen]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+def rss_bytes(pid: int) -> int:
+    """Current resident set size of ``pid``; 0 where ``/proc`` is not available."""
+
+    try:
+        with open(f"/proc/{pid}/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def cpu_seconds(pid: int) -> float:
+    """User plus system CPU time consumed by ``pid``; 0 where ``/proc`` is not available."""
+
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            # The command name may contain spaces, so fields are counted after its closing parenthesis.
+            fields = stat.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def build_script(user_id: int, rng: random.Random) -> List[Step]:
+    """Return the steps and the number of bot replies each one triggers."""
+
+    network = rng.choice(SOCIAL_NETWORKS)
+    service = rng.choice(SERVICE_OPTIONS)
+    steps = [
+        # /start sends the greeting photo and the social network question.
+        Step("start", text="/start", replies=2),
+        Step("social_net", text=network.label),
+        # Service description plus the account prompt.
+        Step("service", text=service.label, replies=2),
+    ]
+    if service.requires_plan():
+        plan = rng.choice(service.subscription_plans)
+        steps.append(Step("link", text=f"https://example.com/id{user_id}"))
+        # Chosen plan, price, payment hint and phone prompt.
+        steps.append(Step("plan", callback_data=f"plan:{plan.code}", replies=4))
+    else:
+        # Price, payment hint and phone prompt.
+        steps.append(Step("link", text=f"https://example.com/id{user_id}", replies=3))
+    email = f"user{user_id}@example.com" if rng.random() < 0.5 else "Пропустить"
+    steps.extend(
+        [
+            Step("phone", text=f"+7900{user_id % 10**7:07d}"),
+            Step("email", text=email),
+            Step("comment", text="Пропустить"),
+            # Payment link, contract link and the final acknowledgement.
+            Step("confirm", callback_data="confirm_request", replies=3),
+        ]
+    )
+    return steps
+
+
+class LoadRunner:
+    """Drive simulated users against a bot process polling :class:`FakeBotAPI`.
+
+    The bot runs in its own process, so its memory and CPU time are read from ``/proc``
+    and its event-loop lag is sampled through the admin ``/loop`` command; the loop lag
+    measured here belongs to the harness and only shows whether it kept up.
+    """
+
+    def __init__(self, api: FakeBotAPI, profile: LoadProfile, bot_pid: int) -> None:
+        self.api = api
+        self.profile = profile
+        self.bot_pid = bot_pid
+        self.report = LoadReport()
+        self._rng = random.Random(profile.seed)
+
+    async def run(self) -> LoadReport:
+        self.report.rss_start = self.report.rss_peak = rss_bytes(self.bot_pid)
+        cpu_start = cpu_seconds(self.bot_pid)
+        self.api.inboxes[ADMIN_USER_ID] = asyncio.Queue()
+        monitor = asyncio.ensure_future(self._monitor())
+        prober = asyncio.ensure_future(self._probe_bot())
+        started = time.perf_counter()
+        users = []
+        for index in range(self.profile.users):
+            users.append(asyncio.ensure_future(self._simulate_user(USER_ID_OFFSET + index)))
+            if self.profile.arrival_rate > 0:
+                await asyncio.sleep(self._rng.expovariate(self.profile.arrival_rate))
+        await asyncio.gather(*users)
+        self.report.duration = time.perf_counter() - started
+        monitor.cancel()
+        prober.cancel()
+        self.report.cpu_seconds = cpu_seconds(self.bot_pid) - cpu_start
+        self.report.rss_end = rss_bytes(self.bot_pid)
+        self.report.rss_peak = max(self.report.rss_peak, self.report.rss_end)
+        return self.report
+
+    async def probe_loop(self) -> Optional[str]:
+        """Ask the bot for its /loop diagnostics and return the document text."""
+
+        inbox = self.api.inboxes.setdefault(ADMIN_USER_ID, asyncio.Queue())
+        admin = {"id": ADMIN_USER_ID, "is_bot": False, "first_name": "LoadTestAdmin"}
+        self.api.push_message(admin, "/loop")
+        try:
+            while True:
+                message = await asyncio.wait_for(inbox.get(), self.profile.step_timeout)
+                if "document" in message:
+                    return message["document"].get("text", "")
+        except asyncio.TimeoutError:
+            return None
+
+    async def _probe_bot(self) -> None:
+        while True:
+            text = await self.probe_loop()
+            match = LOOP_LAG_PATTERN.search(text or "")
+            if match:
+                self.report.bot_loop_lag.append((float(match.group(1)), float(match.group(2))))
+            await asyncio.sleep(self.profile.probe_interval)
+
+    async def _monitor(self, interval: float = 0.1) -> None:
+        loop = asyncio.get_event_loop()
+        ticks = 0
+        while True:
+            scheduled = loop.time()
+            await asyncio.sleep(interval)
+            self.report.harness_loop_lag.append(max(0.0, loop.time() - scheduled - interval))
+            ticks += 1
+            if ticks % 10 == 0:
+                self.report.rss_peak = max(self.report.rss_peak, rss_bytes(self.bot_pid))
+
+    async def _simulate_user(self, user_id: int) -> None:
+        rng = random.Random(self._rng.random())
+        user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+        inbox = self.api.inboxes[user_id] = asyncio.Queue()
+        last_markup_message: Optional[dict] = None
+        self.report.started += 1
+        try:
+            for step in build_script(user_id, rng):
+                if self.profile.think_time > 0 and step.name != "start":
+                    await asyncio.sleep(rng.expovariate(1 / self.profile.think_time))
+                if rng.random() < self.profile.drop_rate:
+                    self.report.dropped[step.name] += 1
+                    return
+                sent = time.perf_counter()
+                if step.callback_data is not None:
+                    self.api.push_callback(user, last_markup_message, step.callback_data)
+                else:
+                    self.api.push_message(user, step.text)
+                try:
+                    for _ in range(step.replies):
+                        remaining = self.profile.step_timeout - (time.perf_counter() - sent)
+                        message = await asyncio.wait_for(inbox.get(), max(remaining, 0))
+                        if "reply_markup" in message:
+                            last_markup_message = message
+                except asyncio.TimeoutError:
+                    self.report.failed[step.name] += 1
+                    return
+                self.report.step_latencies[step.name].append(time.perf_counter() - sent)
+            self.report.completed += 1
+        finally:
+            self.api.inboxes.pop(user_id, None)
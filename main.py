@@ -1,13 +1,45 @@
 """Entry point for running the Telegram bot."""
 from aiogram import executor
 
+from config import settings
 from handlers import dp
-from loader import bot
+from handlers.services import post_data_to_email, queue_monitoring_report
+from loader import bot, outbox, subscriptions
+from outbox import OutboxWorker
+from scheduler import SubscriptionScheduler
+
+outbox_worker = OutboxWorker(
+    outbox,
+    post_data_to_email,
+    batch_size=settings.outbox_batch_size,
+    poll_interval=settings.outbox_poll_interval,
+    backoff_base=settings.outbox_backoff_base,
+    backoff_max=settings.outbox_backoff_max,
+    max_attempts=settings.outbox_max_attempts,
+)
+report_scheduler = SubscriptionScheduler(
+    subscriptions,
+    queue_monitoring_report,
+    batch_size=settings.scheduler_batch_size,
+    rate_limit=settings.scheduler_rate_limit,
+    poll_interval=settings.scheduler_poll_interval,
+    retry_delay=settings.scheduler_retry_delay,
+)
+
+
+async def on_startup(dispatcher):
+    outbox_worker.start()
+    report_scheduler.start()
 
 
 async def on_shutdown(dispatcher):
+    # The scheduler queues into the outbox, so it stops first.
+    await report_scheduler.stop()
+    await outbox_worker.stop()
+    outbox.close()
+    subscriptions.close()
     await bot.close()
 
 
 if __name__ == "__main__":
-    executor.start_polling(dp, skip_updates=True, on_shutdown=on_shutdown)
+    executor.start_polling(dp, skip_updates=True, on_startup=on_startup, on_shutdown=on_shutdown)
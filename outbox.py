@@ -0,0 +1,247 @@
+"""Durable notification outbox backed by SQLite."""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    dead_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS notifications_pending
+    ON notifications (next_attempt_at) WHERE dead_at IS NULL;
+CREATE TABLE IF NOT EXISTS outbox_counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO outbox_counters (name, value)
+    VALUES ('delivered', 0), ('failed_attempts', 0), ('dead_lettered', 0);
+"""
+
+
+@dataclass(frozen=True)
+class OutboxEntry:
+    id: int
+    payload: dict
+    created_at: float
+    attempts: int
+
+
+@dataclass(frozen=True)
+class OutboxStats:
+    pending: int
+    retrying: int
+    dead_letter: int
+    oldest_pending_age: float
+    delivered_total: int
+    failed_attempts_total: int
+
+
+class NotificationOutbox:
+    """SQLite queue of notifications that still have to be delivered.
+
+    A row is deleted only after the sender succeeds, so a crash between enqueueing and
+    delivery simply leaves it pending for the next worker run. Rows that run out of
+    attempts are kept as dead letters for manual handling; running totals live in a
+    separate counters table so no delivery history has to be retained.
+    """
+
+    def __init__(self, path: str) -> None:
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+
+    def enqueue(self, payload: dict, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO notifications (payload, created_at, next_attempt_at) VALUES (?, ?, ?)",
+                (json.dumps(payload, ensure_ascii=False), now, now),
+            )
+        return cursor.lastrowid
+
+    def claim_due(self, limit: int, now: Optional[float] = None) -> List[OutboxEntry]:
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, payload, created_at, attempts FROM notifications "
+                "WHERE dead_at IS NULL AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT ?",
+                (now, limit),
+            ).fetchall()
+        return [OutboxEntry(row[0], json.loads(row[1]), row[2], row[3]) for row in rows]
+
+    def mark_delivered(self, entry_id: int) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("BEGIN")
+            self._connection.execute("DELETE FROM notifications WHERE id = ?", (entry_id,))
+            self._increment("delivered")
+
+    def mark_failed(self, entry_id: int, next_attempt_at: float, error: str) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("BEGIN")
+            self._connection.execute(
+                "UPDATE notifications SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (next_attempt_at, error, entry_id),
+            )
+            self._increment("failed_attempts")
+
+    def mark_dead(self, entry_id: int, error: str, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock, self._connection:
+            self._connection.execute("BEGIN")
+            self._connection.execute(
+                "UPDATE notifications SET attempts = attempts + 1, dead_at = ?, last_error = ? WHERE id = ?",
+                (now, error, entry_id),
+            )
+            self._increment("failed_attempts")
+            self._increment("dead_lettered")
+
+    def _increment(self, name: str) -> None:
+        self._connection.execute("UPDATE outbox_counters SET value = value + 1 WHERE name = ?", (name,))
+
+    def stats(self, now: Optional[float] = None) -> OutboxStats:
+        now = time.time() if now is None else now
+        with self._lock:
+            pending, retrying, oldest = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(attempts > 0), 0), MIN(created_at) "
+                "FROM notifications WHERE dead_at IS NULL"
+            ).fetchone()
+            (dead,) = self._connection.execute(
+                "SELECT COUNT(*) FROM notifications WHERE dead_at IS NOT NULL"
+            ).fetchone()
+            counters = dict(self._connection.execute("SELECT name, value FROM outbox_counters").fetchall())
+        return OutboxStats(
+            pending=pending,
+            retrying=retrying,
+            dead_letter=dead,
+            oldest_pending_age=max(0.0, now - oldest) if oldest is not None else 0.0,
+            delivered_total=counters["delivered"],
+            failed_attempts_total=counters["failed_attempts"],
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class OutboxWorker:
+    """Background task draining the outbox in batches with exponential backoff.
+
+    ``deliver`` receives the payloads of a whole batch, so it can reuse one connection
+    for all of them, and returns one success flag per payload in the same order.
+    """
+
+    def __init__(
+        self,
+        outbox: NotificationOutbox,
+        deliver: Callable[[List[dict]], Awaitable[List[bool]]],
+        batch_size: int = 20,
+        poll_interval: float = 2.0,
+        backoff_base: float = 5.0,
+        backoff_max: float = 900.0,
+        max_attempts: int = 10,
+        stats_interval: float = 60.0,
+    ) -> None:
+        self.outbox = outbox
+        self.deliver = deliver
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_attempts = max_attempts
+        self.stats_interval = stats_interval
+        self._task: Optional[asyncio.Task] = None
+
+    def backoff(self, attempts: int) -> float:
+        """Return the delay before the next attempt after ``attempts`` failures."""
+
+        return min(self.backoff_max, self.backoff_base * 2 ** max(attempts - 1, 0))
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_event_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def drain_once(self) -> int:
+        """Deliver one batch of due notifications and return how many succeeded."""
+
+        entries = self.outbox.claim_due(self.batch_size)
+        if not entries:
+            return 0
+        try:
+            results = await self.deliver([entry.payload for entry in entries])
+            errors = [None if ok else "sender reported failure" for ok in results]
+        except Exception as exc:  # pragma: no cover - depends on the sender
+            errors = [repr(exc)] * len(entries)
+        delivered = 0
+        for entry, error in zip(entries, errors):
+            if error is None:
+                self.outbox.mark_delivered(entry.id)
+                delivered += 1
+            elif entry.attempts + 1 >= self.max_attempts:
+                self.outbox.mark_dead(entry.id, error)
+                logger.error(
+                    "Notification %s moved to dead letter after %s attempts, handle it manually: %s",
+                    entry.id,
+                    entry.attempts + 1,
+                    error,
+                )
+            else:
+                attempts = entry.attempts + 1
+                delay = self.backoff(attempts)
+                self.outbox.mark_failed(entry.id, time.time() + delay, error)
+                logger.warning(
+                    "Notification %s failed (attempt %s), retrying in %.0fs: %s", entry.id, attempts, delay, error
+                )
+        return delivered
+
+    async def _run(self) -> None:
+        last_report = 0.0
+        while True:
+            try:
+                batch_full = await self.drain_once() >= self.batch_size
+            except Exception:  # pragma: no cover - keep the worker alive on storage errors
+                logger.exception("Outbox worker iteration failed")
+                batch_full = False
+            now = time.monotonic()
+            if now - last_report >= self.stats_interval:
+                stats = self.outbox.stats()
+                logger.log(
+                    logging.WARNING if stats.dead_letter else logging.INFO,
+                    "Outbox: pending=%s retrying=%s dead_letter=%s oldest_age=%.1fs delivered=%s failed_attempts=%s",
+                    stats.pending,
+                    stats.retrying,
+                    stats.dead_letter,
+                    stats.oldest_pending_age,
+                    stats.delivered_total,
+                    stats.failed_attempts_total,
+                )
+                last_report = now
+            if not batch_full:
+                await asyncio.sleep(self.poll_interval)
@@ -0,0 +1,336 @@
+"""Persistent scheduler for monitoring subscription reports."""
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Deque, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# The partial index keeps only active subscriptions ordered by their next run, so the
+# due-lookup is a B-tree range scan: O(log n) to find the first row plus the batch.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscriptions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    telegram_id INTEGER NOT NULL,
+    plan_code TEXT NOT NULL,
+    plan_label TEXT NOT NULL,
+    target TEXT NOT NULL,
+    interval_seconds REAL NOT NULL,
+    next_run_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_run_at REAL,
+    deliveries INTEGER NOT NULL DEFAULT 0,
+    active INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS subscriptions_due
+    ON subscriptions (next_run_at) WHERE active = 1;
+CREATE UNIQUE INDEX IF NOT EXISTS subscriptions_identity
+    ON subscriptions (telegram_id, plan_code, target);
+"""
+
+_COLUMNS = "id, telegram_id, plan_code, plan_label, target, interval_seconds, next_run_at, expires_at, deliveries"
+
+
+@dataclass(frozen=True)
+class Subscription:
+    id: int
+    telegram_id: int
+    plan_code: str
+    plan_label: str
+    target: str
+    interval_seconds: float
+    next_run_at: float
+    expires_at: float
+    deliveries: int
+
+
+class SubscriptionCancelled(Exception):
+    """Raised by the sender when a subscription must stop instead of being delivered."""
+
+
+@dataclass(frozen=True)
+class SchedulerStats:
+    active: int
+    overdue: int
+    delivered_total: int
+    failed_total: int
+    cancelled_total: int
+    lag_p50: float
+    lag_max: float
+
+
+class SubscriptionStore:
+    """SQLite table of subscriptions indexed by their next delivery time."""
+
+    def __init__(self, path: str) -> None:
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+
+    def add(
+        self,
+        telegram_id: int,
+        plan_code: str,
+        plan_label: str,
+        target: str,
+        interval_seconds: float,
+        first_run_at: float,
+        period_seconds: float,
+        now: Optional[float] = None,
+    ) -> int:
+        """Create the subscription or renew the existing one for the same user, plan and target.
+
+        Each call pays for ``period_seconds``. Renewing an active subscription keeps its
+        schedule and adds the period to the current expiry; an inactive one is reactivated
+        starting from ``first_run_at``.
+        """
+
+        now = time.time() if now is None else now
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO subscriptions (telegram_id, plan_code, plan_label, target, interval_seconds, next_run_at, "
+                "expires_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (telegram_id, plan_code, target) DO UPDATE SET "
+                "plan_label = excluded.plan_label, "
+                "interval_seconds = excluded.interval_seconds, "
+                "next_run_at = CASE WHEN active = 1 THEN next_run_at ELSE excluded.next_run_at END, "
+                "expires_at = CASE WHEN active = 1 THEN MAX(expires_at, ?) + ? ELSE excluded.expires_at END, "
+                "active = 1",
+                (
+                    telegram_id,
+                    plan_code,
+                    plan_label,
+                    target,
+                    interval_seconds,
+                    first_run_at,
+                    now + period_seconds,
+                    now,
+                    now,
+                    period_seconds,
+                ),
+            )
+            (subscription_id,) = self._connection.execute(
+                "SELECT id FROM subscriptions WHERE telegram_id = ? AND plan_code = ? AND target = ?",
+                (telegram_id, plan_code, target),
+            ).fetchone()
+        return subscription_id
+
+    def due(self, limit: int, now: Optional[float] = None) -> List[Subscription]:
+        """Return due subscriptions, deactivating those whose due run falls after their expiry.
+
+        Expired rows are only left active when the bot was down past the end of the paid
+        period; they are switched off here instead of producing a report.
+        """
+
+        now = time.time() if now is None else now
+        with self._lock:
+            self._connection.execute(
+                "UPDATE subscriptions SET active = 0 WHERE active = 1 AND next_run_at <= ? AND next_run_at > expires_at",
+                (now,),
+            )
+            rows = self._connection.execute(
+                f"SELECT {_COLUMNS} FROM subscriptions WHERE active = 1 AND next_run_at <= ? "
+                "AND next_run_at <= expires_at ORDER BY next_run_at LIMIT ?",
+                (now, limit),
+            ).fetchall()
+        return [Subscription(*row) for row in rows]
+
+    def active_for(self, telegram_id: int) -> List[Subscription]:
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {_COLUMNS} FROM subscriptions WHERE active = 1 AND telegram_id = ? ORDER BY id",
+                (telegram_id,),
+            ).fetchall()
+        return [Subscription(*row) for row in rows]
+
+    def next_run_at(self) -> Optional[float]:
+        with self._lock:
+            (value,) = self._connection.execute(
+                "SELECT MIN(next_run_at) FROM subscriptions WHERE active = 1"
+            ).fetchone()
+        return value
+
+    def mark_delivered(self, subscription: Subscription, now: Optional[float] = None) -> None:
+        """Move the subscription to its next period, skipping periods missed during downtime.
+
+        A subscription whose next period would start after it expires is deactivated.
+        """
+
+        now = time.time() if now is None else now
+        next_run_at = subscription.next_run_at + subscription.interval_seconds
+        if next_run_at <= now:
+            next_run_at = now + subscription.interval_seconds
+        with self._lock:
+            self._connection.execute(
+                "UPDATE subscriptions SET next_run_at = ?, last_run_at = ?, deliveries = deliveries + 1, "
+                "active = CASE WHEN ? > expires_at THEN 0 ELSE 1 END WHERE id = ?",
+                (next_run_at, now, next_run_at, subscription.id),
+            )
+
+    def postpone(self, subscription_id: int, next_run_at: float) -> None:
+        with self._lock:
+            self._connection.execute(
+                "UPDATE subscriptions SET next_run_at = ? WHERE id = ?", (next_run_at, subscription_id)
+            )
+
+    def deactivate(self, subscription_id: int, telegram_id: Optional[int] = None) -> bool:
+        """Stop the subscription; with ``telegram_id`` only if it belongs to that user."""
+
+        with self._lock:
+            if telegram_id is None:
+                cursor = self._connection.execute(
+                    "UPDATE subscriptions SET active = 0 WHERE id = ? AND active = 1", (subscription_id,)
+                )
+            else:
+                cursor = self._connection.execute(
+                    "UPDATE subscriptions SET active = 0 WHERE id = ? AND telegram_id = ? AND active = 1",
+                    (subscription_id, telegram_id),
+                )
+        return cursor.rowcount > 0
+
+    def counts(self, now: Optional[float] = None) -> tuple:
+        """Return the number of active and overdue subscriptions."""
+
+        now = time.time() if now is None else now
+        with self._lock:
+            (active,) = self._connection.execute("SELECT COUNT(*) FROM subscriptions WHERE active = 1").fetchone()
+            (overdue,) = self._connection.execute(
+                "SELECT COUNT(*) FROM subscriptions WHERE active = 1 AND next_run_at <= ?", (now,)
+            ).fetchone()
+        return active, overdue
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class SubscriptionScheduler:
+    """Background task handing due subscriptions to a rate-limited batch sender.
+
+    ``send`` runs in the bot's event loop; a failed delivery is retried after
+    ``retry_delay`` seconds without moving the subscription to its next period.
+    A sender raising :class:`SubscriptionCancelled` deactivates the subscription, and
+    the run is counted neither as delivered nor as failed.
+    """
+
+    def __init__(
+        self,
+        store: SubscriptionStore,
+        send: Callable[[Subscription], Awaitable[None]],
+        batch_size: int = 100,
+        rate_limit: float = 20.0,
+        poll_interval: float = 30.0,
+        retry_delay: float = 300.0,
+        stats_interval: float = 60.0,
+    ) -> None:
+        self.store = store
+        self.send = send
+        self.batch_size = batch_size
+        self.rate_limit = rate_limit
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.stats_interval = stats_interval
+        self.delivered_total = 0
+        self.failed_total = 0
+        self.cancelled_total = 0
+        self._lags: Deque[float] = deque(maxlen=1000)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_event_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> SchedulerStats:
+        active, overdue = self.store.counts()
+        lags = sorted(self._lags)
+        return SchedulerStats(
+            active=active,
+            overdue=overdue,
+            delivered_total=self.delivered_total,
+            failed_total=self.failed_total,
+            cancelled_total=self.cancelled_total,
+            lag_p50=lags[len(lags) // 2] if lags else 0.0,
+            lag_max=lags[-1] if lags else 0.0,
+        )
+
+    async def run_once(self) -> int:
+        """Send one batch of due reports and return how many were delivered."""
+
+        batch = self.store.due(self.batch_size)
+        if not batch:
+            return 0
+        started = time.monotonic()
+        results = await asyncio.gather(
+            *(self._deliver(subscription, started + index / self.rate_limit) for index, subscription in enumerate(batch))
+        )
+        return sum(results)
+
+    async def _deliver(self, subscription: Subscription, not_before: float) -> bool:
+        await asyncio.sleep(max(0.0, not_before - time.monotonic()))
+        try:
+            await self.send(subscription)
+        except SubscriptionCancelled as exc:
+            self.cancelled_total += 1
+            self.store.deactivate(subscription.id)
+            logger.info("Subscription %s cancelled: %s", subscription.id, exc)
+            return False
+        except Exception as exc:  # pragma: no cover - depends on the sender
+            self.failed_total += 1
+            self.store.postpone(subscription.id, time.time() + self.retry_delay)
+            logger.warning("Report for subscription %s failed, retrying later: %s", subscription.id, exc)
+            return False
+        now = time.time()
+        self._lags.append(max(0.0, now - subscription.next_run_at))
+        self.store.mark_delivered(subscription, now)
+        self.delivered_total += 1
+        return True
+
+    async def _run(self) -> None:
+        last_report = 0.0
+        while True:
+            try:
+                delivered = await self.run_once()
+                next_run_at = self.store.next_run_at()
+            except Exception:  # pragma: no cover - keep the scheduler alive on storage errors
+                logger.exception("Subscription scheduler iteration failed")
+                delivered, next_run_at = 0, None
+            now = time.monotonic()
+            if now - last_report >= self.stats_interval:
+                stats = self.stats()
+                logger.info(
+                    "Scheduler: active=%s overdue=%s delivered=%s failed=%s cancelled=%s lag_p50=%.1fs lag_max=%.1fs",
+                    stats.active,
+                    stats.overdue,
+                    stats.delivered_total,
+                    stats.failed_total,
+                    stats.cancelled_total,
+                    stats.lag_p50,
+                    stats.lag_max,
+                )
+                last_report = now
+            if delivered >= self.batch_size:
+                continue
+            delay = self.poll_interval
+            if next_run_at is not None:
+                delay = min(delay, max(0.0, next_run_at - time.time()))
+            await asyncio.sleep(delay)
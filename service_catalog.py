@@ -24,6 +24,7 @@ class SubscriptionPlan:
     label: str
     price: int
     description: str
+    interval_days: int
 
 
 @dataclass(frozen=True)
@@ -60,10 +61,13 @@ SOCIAL_NETWORKS: Tuple[SocialNetwork, ...] = (
 )
 
 SUBSCRIPTION_PLANS: Tuple[SubscriptionPlan, ...] = (
-    SubscriptionPlan("monthly", "Ежемесячно за 250 руб/мес", 250, "Базовый мониторинг с отчетом раз в месяц."),
-    SubscriptionPlan("weekly", "Еженедельно за 800 руб/мес", 800, "Подробные отчеты каждую неделю."),
-    SubscriptionPlan("daily", "Ежедневно за 4500 руб/мес", 4500, "Максимальная скорость реакции и ежедневные отчеты."),
+    SubscriptionPlan("monthly", "Ежемесячно за 250 руб/мес", 250, "Базовый мониторинг с отчетом раз в месяц.", 30),
+    SubscriptionPlan("weekly", "Еженедельно за 800 руб/мес", 800, "Подробные отчеты каждую неделю.", 7),
+    SubscriptionPlan("daily", "Ежедневно за 4500 руб/мес", 4500, "Максимальная скорость реакции и ежедневные отчеты.", 1),
 )
+FIRST_REPORT_DELAY_DAYS = 2
+# Plans are billed per month, so one confirmed order covers one month of reports.
+SUBSCRIPTION_PERIOD_DAYS = 30
 
 SERVICE_OPTIONS: Tuple[ServiceOption, ...] = (
     ServiceOption(
@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(PROJECT_ROOT))
+# Handlers open their assets relative to the project root.
+os.chdir(PROJECT_ROOT)
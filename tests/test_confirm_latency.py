@@ -0,0 +1,129 @@
+"""Latency budget and outbox failure handling of the confirmation step, against the fake Bot API."""
+import asyncio
+import os
+import socket
+import sqlite3
+import tempfile
+import time
+
+import pytest
+
+pytest.importorskip("aiogram")
+
+from loadtest.fake_bot_api import FakeBotAPI  # noqa: E402
+
+API_LATENCY = 0.2
+USER_ID = 4242
+# The three chat messages must stay sequential; the callback answer and the keyboard
+# removal have to overlap with the first one. Three round trips fit the target, a
+# handler that awaits the callback answer on its own takes four.
+LATENCY_TARGET = 3.5 * API_LATENCY
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# The bot reads its API server from the environment once, at import time, so every
+# test talks to a fake server on the same port.
+PORT = _free_port()
+
+
+async def _run_confirmation(fail_enqueue: bool = False):
+    workdir = tempfile.mkdtemp(prefix="confirm-latency-")
+    os.environ.update(
+        TOKEN="123456:LATENCYTEST",
+        TELEGRAM_API_SERVER=f"http://127.0.0.1:{PORT}",
+        TELEGRAM_MAX_RETRIES="0",
+        HOST="127.0.0.1:1",
+        EMAIL_PASSWORD="test",
+        EMAIL_FROM="bot@example.com",
+        EMAIL_TO_1="operators@example.com",
+        OUTBOX_PATH=os.path.join(workdir, "outbox.sqlite3"),
+        SUBSCRIPTIONS_PATH=os.path.join(workdir, "subscriptions.sqlite3"),
+    )
+    api = FakeBotAPI(port=PORT, latency=API_LATENCY)
+    await api.start()
+
+    from aiogram import Bot, Dispatcher, types
+
+    from handlers.services import confirm_request
+    from handlers.states import AuthState
+    from loader import bot, dp, outbox
+
+    Bot.set_current(bot)
+    Dispatcher.set_current(dp)
+    state = dp.current_state(chat=USER_ID, user=USER_ID)
+    await state.set_state(AuthState.confirmation)
+    await state.set_data(
+        {
+            "social_net": "Вконтакте",
+            "service": "Анализ утечек",
+            "service_code": "leak_analysis",
+            "link": "https://example.com/id1",
+            "price": 300,
+            "subscription_plan": None,
+            "subscription_plan_code": None,
+            "phone": "+79000000000",
+            "email": None,
+            "comment": None,
+        }
+    )
+    user = {"id": USER_ID, "is_bot": False, "first_name": "Test"}
+    call = types.CallbackQuery.to_object(
+        {
+            "id": "1",
+            "from": user,
+            "chat_instance": "1",
+            "data": "confirm_request",
+            "message": {
+                "message_id": 1,
+                "from": {"id": 1, "is_bot": True, "first_name": "Bot"},
+                "chat": {"id": USER_ID, "type": "private"},
+                "date": int(time.time()),
+                "text": "summary",
+            },
+        }
+    )
+    inbox = api.inboxes[USER_ID] = asyncio.Queue()
+    pending_before = outbox.stats().pending
+    enqueue = outbox.enqueue
+    if fail_enqueue:
+        outbox.enqueue = _failing_enqueue
+    try:
+        started = time.perf_counter()
+        await confirm_request(call, state)
+        elapsed = time.perf_counter() - started
+        messages = [inbox.get_nowait()["text"] for _ in range(inbox.qsize())]
+        queued = outbox.stats().pending - pending_before
+    finally:
+        outbox.enqueue = enqueue
+        await bot.close()
+        await api.stop()
+    return elapsed, messages, queued, await state.get_state()
+
+
+def _failing_enqueue(payload):
+    raise sqlite3.OperationalError("database is locked")
+
+
+def test_confirm_request_meets_latency_target():
+    elapsed, messages, queued, final_state = asyncio.run(_run_confirmation())
+
+    assert elapsed < LATENCY_TARGET, f"confirm_request took {elapsed * 1000:.0f}ms"
+    assert len(messages) == 3
+    assert messages[0].startswith("Вы можете оплатить заказ")
+    assert messages[1].startswith("Отчет о работе будет направлен")
+    assert messages[2].startswith("Заявка принята")
+    assert queued == 1
+    assert final_state is None
+
+
+def test_confirm_request_keeps_state_when_outbox_fails():
+    _, messages, queued, final_state = asyncio.run(_run_confirmation(fail_enqueue=True))
+
+    assert queued == 0
+    assert messages == ["Не удалось сохранить заявку. Пожалуйста, нажмите «Подтвердить» ещё раз через минуту."]
+    assert final_state == "AuthState:confirmation"
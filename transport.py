@@ -0,0 +1,164 @@
+"""Telegram Bot API transport with connection tuning, retries and per-method stats."""
+import asyncio
+import io
+import logging
+import random
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional
+
+from aiogram import Bot
+from aiogram.types import InputFile
+from aiogram.utils.exceptions import NetworkError, RestartingTelegram, RetryAfter, TelegramAPIError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MethodStats:
+    calls: int = 0
+    errors: int = 0
+    retries: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    error_types: Counter = field(default_factory=Counter)
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+    def record(self, elapsed: float, error: Optional[BaseException] = None) -> None:
+        self.calls += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        if error is not None:
+            self.errors += 1
+            self.error_types[type(error).__name__] += 1
+
+
+# Methods that can be repeated without visible side effects. Anything that may create
+# a message is only retried on flood control, which Telegram guarantees was rejected.
+IDEMPOTENT_METHODS = frozenset(
+    {
+        "getUpdates",
+        "getMe",
+        "getChat",
+        "getChatMember",
+        "getFile",
+        "getWebhookInfo",
+        "setWebhook",
+        "deleteWebhook",
+        "getMyCommands",
+        "setMyCommands",
+        "answerCallbackQuery",
+        "editMessageReplyMarkup",
+        "editMessageText",
+        "editMessageCaption",
+        "deleteMessage",
+    }
+)
+
+
+def _is_transient(exc: BaseException) -> bool:
+    # Plain TelegramAPIError is what aiogram raises for 5xx responses; its subclasses
+    # (BadRequest, Unauthorized, ...) describe permanent failures.
+    return isinstance(exc, (RestartingTelegram, NetworkError, asyncio.TimeoutError)) or (
+        type(exc) is TelegramAPIError
+    )
+
+
+def _buffer_files(files: Optional[dict]) -> Dict[str, tuple]:
+    """Read uploads into memory; aiohttp closes the streams after every attempt."""
+
+    return {
+        key: (value.filename, value.file.read())
+        for key, value in (files or {}).items()
+        if isinstance(value, InputFile)
+    }
+
+
+class TelegramBot(Bot):
+    """aiogram ``Bot`` with a tuned connection pool and a retry policy for transient errors.
+
+    Flood-control (429) responses are retried for every method after ``retry_after``
+    (plus jitter) unless it exceeds ``max_retry_after``. 5xx, timeouts and network
+    errors leave it unknown whether Telegram applied the call, so they are retried with
+    jittered exponential backoff only for ``idempotent_methods``. At most
+    ``max_retries`` retries are made.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        *,
+        keepalive_timeout: float = 60.0,
+        dns_cache_ttl: int = 300,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10.0,
+        max_retry_after: float = 30.0,
+        idempotent_methods: Iterable[str] = IDEMPOTENT_METHODS,
+        **kwargs,
+    ) -> None:
+        super().__init__(token, **kwargs)
+        self._connector_init.update(
+            use_dns_cache=True,
+            ttl_dns_cache=dns_cache_ttl,
+            keepalive_timeout=keepalive_timeout,
+        )
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.idempotent_methods = frozenset(idempotent_methods)
+        self.method_stats: Dict[str, MethodStats] = defaultdict(MethodStats)
+
+    def retry_delay(self, method: str, exc: BaseException, attempt: int) -> Optional[float]:
+        """Return how long to wait before retry number ``attempt + 1``, or ``None`` to give up."""
+
+        if attempt >= self.max_retries:
+            return None
+        if isinstance(exc, RetryAfter):
+            if exc.timeout > self.max_retry_after:
+                return None
+            return exc.timeout + random.uniform(0, self.backoff_base)
+        if method not in self.idempotent_methods or not _is_transient(exc):
+            return None
+        ceiling = min(self.backoff_max, self.backoff_base * 2**attempt)
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+    async def request(self, method, data=None, files=None, **kwargs):
+        stats = self.method_stats[method]
+        buffered = _buffer_files(files) if self.max_retries else {}
+        attempt = 0
+        while True:
+            if buffered:
+                files = {
+                    **files,
+                    **{key: InputFile(io.BytesIO(content), filename) for key, (filename, content) in buffered.items()},
+                }
+            started = time.perf_counter()
+            try:
+                result = await super().request(method, data, files, **kwargs)
+            except (TelegramAPIError, asyncio.TimeoutError) as exc:
+                stats.record(time.perf_counter() - started, exc)
+                delay = self.retry_delay(method, exc, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                stats.retries += 1
+                logger.warning("Telegram %s failed (%s), retry %s in %.2fs", method, exc, attempt, delay)
+                await asyncio.sleep(delay)
+                continue
+            stats.record(time.perf_counter() - started)
+            return result
+
+    def format_stats(self) -> str:
+        lines = [f"{'method':<28}{'calls':>8}{'errors':>8}{'retries':>8}{'mean ms':>10}{'max ms':>10}"]
+        for method, stats in sorted(self.method_stats.items()):
+            lines.append(
+                f"{method:<28}{stats.calls:>8}{stats.errors:>8}{stats.retries:>8}"
+                f"{stats.mean_time * 1000:>10.1f}{stats.max_time * 1000:>10.1f}"
+            )
+        return "\n".join(lines)